@@ -12,25 +12,77 @@ Dann im Browser öffnen: http://localhost:8000
 
 Abhängigkeiten:
     pip install Pillow
+
+    Optional (schneller, gleiche API):
+    pip uninstall Pillow && CC="cc -mavx2" pip install pillow-simd
+    Für schnelles JPEG-Encoding sollte libjpeg-turbo installiert sein.
+
+    Optional (schnelleres Parsen großer JSON-Uploads, schnelleres Hashen):
+    pip install orjson xxhash
+
+    Optional (libvips-Pipeline statt Pillow, deutlich weniger Speicher):
+    pip install pyvips
+
+Umgebungsvariablen:
+    SNAPFMT_RESAMPLE  Resampling-Filter (bicubic, hamming, box, lanczos, ...),
+                      gilt nur für die Pillow-Verarbeitung
+    SNAPFMT_BACKEND   Bildverarbeitung: 'vips' (Standard, falls pyvips
+                      installiert) oder 'pillow'
 """
 
 import http.server
-import socketserver
 import webbrowser
 import json
 import base64
 import io
+import os
+import socket
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from urllib.parse import parse_qs
+from urllib.parse import parse_qs, urlparse
 
 # Pillow für Bildverarbeitung
 try:
-    from PIL import Image
+    from PIL import Image, ImageOps, ExifTags, UnidentifiedImageError
 except ImportError:
     print("Fehler: Pillow nicht installiert!")
     print("Bitte installieren mit: pip install Pillow")
     exit(1)
 
+# Alle Pillow-Plugins einmalig beim Import registrieren statt beim ersten Öffnen
+Image.init()
+
+# orjson für schnelles JSON (optional, sonst Standardbibliothek)
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(data) -> bytes:
+        return json.dumps(data).encode()
+    _loads = json.loads
+
+# xxhash für schnelle Inhalts-Hashes (optional, sonst BLAKE2)
+try:
+    import xxhash
+
+    def _content_hash(data) -> int:
+        return xxhash.xxh3_64_intdigest(data)
+except ImportError:
+    def _content_hash(data) -> bytes:
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+# pyvips für eine speicherschonende Streaming-Pipeline (optional, sonst Pillow)
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+
 # ===== Konfiguration =====
 PORT = 8000
 HOST = "localhost"
@@ -38,89 +90,230 @@ TARGET_WIDTH = 1080
 TARGET_HEIGHT = 1920
 TARGET_RATIO = 9 / 16  # 0.5625
 JPEG_QUALITY = 92
+JPEG_BUFFER_SIZE = 512 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+SEND_BUFFER_SIZE = 1024 * 1024
+CACHE_SIZE = 64
+
+# Verarbeitung: pyvips (falls installiert) oder Pillow, fest einstellbar
+# über SNAPFMT_BACKEND ('pillow' oder 'vips')
+BACKEND = (os.environ.get('SNAPFMT_BACKEND')
+           or ('vips' if pyvips is not None else 'pillow')).lower()
+if BACKEND not in ('pillow', 'vips'):
+    print(f"Fehler: Unbekanntes SNAPFMT_BACKEND '{BACKEND}'!")
+    print("Erlaubt sind: pillow, vips")
+    exit(1)
+if BACKEND == 'vips' and pyvips is None:
+    print("Fehler: SNAPFMT_BACKEND=vips, aber pyvips nicht installiert!")
+    print("Bitte installieren mit: pip install pyvips")
+    exit(1)
+
+# Resampling-Filter: BICUBIC ist deutlich schneller als LANCZOS und bei
+# Handyfoto → 1080p optisch nicht zu unterscheiden. Ohne feste Vorgabe
+# wird bei starker Verkleinerung (> 3x) das noch günstigere HAMMING genutzt.
+# Fest einstellbar über SNAPFMT_RESAMPLE (z. B. 'lanczos' für beste Qualität).
+RESAMPLE_ENV = os.environ.get('SNAPFMT_RESAMPLE', '').upper()
+if RESAMPLE_ENV and RESAMPLE_ENV not in Image.Resampling.__members__:
+    print(f"Fehler: Unbekannter Filter SNAPFMT_RESAMPLE='{RESAMPLE_ENV.lower()}'!")
+    print("Erlaubt sind: " + ", ".join(name.lower() for name in Image.Resampling.__members__))
+    exit(1)
+RESAMPLE = Image.Resampling[RESAMPLE_ENV] if RESAMPLE_ENV else Image.Resampling.BICUBIC
+
+# pyvips-Loader für die erlaubten Eingabeformate (wie INPUT_FORMATS)
+VIPS_LOADERS = ('jpegload_buffer', 'pngload_buffer', 'webpload_buffer', 'heifload_buffer')
+
+# Gültige Zuschnitt-Modi
+CROP_MODES = ("center", "top", "bottom")
+
+# Modi, die Pillow direkt skalieren kann (Konvertierung erst danach)
+RESIZE_MODES = ('RGB', 'RGBA', 'L', 'LA', 'CMYK')
+
+# EXIF-Tag-ID für die Ausrichtung (274), einmalig beim Import ermitteln
+ORIENTATION_TAG = next(k for k, v in ExifTags.TAGS.items() if v == 'Orientation')
+
+# Erlaubte Eingabeformate: Image.open prüft nur diese statt aller ~40 Plugins
+INPUT_FORMATS = tuple(
+    f for f in ('JPEG', 'MPO', 'PNG', 'WEBP', 'HEIF') if f in Image.OPEN
+)
+
+# Formate, bei denen Kameras eine EXIF-Ausrichtung setzen (PNG-Screenshots nicht)
+EXIF_FORMATS = ('JPEG', 'MPO', 'WEBP', 'HEIF')
 
 # Verzeichnis der HTML-Datei
 DIRECTORY = Path(__file__).parent
 
+# Zuletzt verarbeitete Bilder: (Hash, Modus, optimize) → (JPEG-Bytes, Info)
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
 
-def process_image(image_data: bytes, crop_mode: str = "center") -> tuple[bytes, dict]:
-    """
-    Verarbeitet ein Bild: Zuschnitt auf 9:16 und Skalierung auf 1080x1920.
+# Worker-Prozesse für die Bildverarbeitung (parallel über mehrere Requests),
+# wird in main() gestartet und nach einem Absturz neu aufgebaut
+EXECUTOR = None
+_executor_lock = threading.Lock()
 
-    Args:
-        image_data: Rohe Bilddaten als Bytes
-        crop_mode: Zuschnitt-Modus ('center', 'top', 'bottom')
 
-    Returns:
-        Tuple aus (verarbeitete JPEG-Bytes, Info-Dictionary)
+def cache_get(key: tuple):
+    """Liefert ein zwischengespeichertes Ergebnis oder None."""
+    with _result_cache_lock:
+        entry = _result_cache.get(key)
+        if entry is not None:
+            _result_cache.move_to_end(key)
+        return entry
+
+
+def cache_put(key: tuple, entry: tuple):
+    """Speichert ein Ergebnis und verwirft bei Bedarf das älteste."""
+    with _result_cache_lock:
+        _result_cache[key] = entry
+        _result_cache.move_to_end(key)
+        if len(_result_cache) > CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+
+def _worker_init(counter):
+    """Initialisiert einen Worker-Prozess: CPU zuweisen."""
+    # Unter Linux jeden Worker auf einen eigenen Kern pinnen (Cache-Lokalität)
+    if hasattr(os, 'sched_setaffinity'):
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpus[index % len(cpus)]})
+
+
+def _available_cpus() -> int:
+    """Anzahl der nutzbaren CPUs (berücksichtigt cpuset-Limits in Containern)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def start_executor() -> ProcessPoolExecutor:
+    """Startet die Worker-Prozesse und wärmt sie vor dem ersten Request auf."""
+    workers = _available_cpus()
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_worker_init,
+        initargs=(multiprocessing.Value('i', 0),)
+    )
+
+    # Leere Aufgaben erzwingen den Start aller Worker
+    for future in [executor.submit(os.getpid) for _ in range(workers)]:
+        future.result()
+
+    return executor
+
+
+def run_in_executor(image_data: bytes, crop_mode: str, optimize: bool) -> tuple[bytes, dict]:
     """
-    # Bild öffnen
-    img = Image.open(io.BytesIO(image_data))
+    Führt process_image im Worker-Pool aus.
 
-    # EXIF-Rotation korrigieren (falls vorhanden)
+    Stirbt ein Worker (z. B. OOM-Kill oder Absturz in libjpeg/libvips), ist
+    der Pool dauerhaft defekt; er wird dann neu gestartet und die Aufgabe
+    einmal wiederholt.
+    """
+    global EXECUTOR
+    executor = EXECUTOR
     try:
-        from PIL import ExifTags
-        for orientation in ExifTags.TAGS.keys():
-            if ExifTags.TAGS[orientation] == 'Orientation':
-                break
-        exif = img._getexif()
-        if exif is not None:
-            orientation_value = exif.get(orientation)
-            if orientation_value == 3:
-                img = img.rotate(180, expand=True)
-            elif orientation_value == 6:
-                img = img.rotate(270, expand=True)
-            elif orientation_value == 8:
-                img = img.rotate(90, expand=True)
-    except (AttributeError, KeyError, IndexError):
-        pass
-
-    # In RGB konvertieren (falls RGBA oder anderes Format)
-    if img.mode in ('RGBA', 'P', 'LA'):
-        # Weißer Hintergrund für transparente Bilder
-        background = Image.new('RGB', img.size, (255, 255, 255))
-        if img.mode == 'P':
-            img = img.convert('RGBA')
-        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-        img = background
-    elif img.mode != 'RGB':
-        img = img.convert('RGB')
+        return executor.submit(process_image, image_data, crop_mode, optimize).result()
+    except BrokenProcessPool:
+        with _executor_lock:
+            # Nur neu starten, falls kein anderer Thread das schon getan hat
+            if EXECUTOR is executor:
+                print("Worker-Pool defekt, starte neu...")
+                executor.shutdown(wait=False, cancel_futures=True)
+                EXECUTOR = start_executor()
+            executor = EXECUTOR
+        return executor.submit(process_image, image_data, crop_mode, optimize).result()
+
+
+def calculate_crop(width: int, height: int, crop_mode: str) -> tuple[int, int, int, int]:
+    """
+    Berechnet den 9:16-Zuschnitt-Bereich.
 
-    # Original-Dimensionen speichern
-    orig_width, orig_height = img.size
-    img_ratio = orig_width / orig_height
+    Returns:
+        Tuple aus (x, y, Breite, Höhe)
+    """
+    img_ratio = width / height
 
-    # Zuschnitt-Bereich berechnen
     if img_ratio > TARGET_RATIO:
         # Bild ist breiter als 9:16 → Seiten abschneiden
-        crop_height = orig_height
-        crop_width = int(orig_height * TARGET_RATIO)
+        crop_height = height
+        crop_width = int(height * TARGET_RATIO)
         crop_y = 0
-        crop_x = (orig_width - crop_width) // 2
+        crop_x = (width - crop_width) // 2
     else:
         # Bild ist höher als 9:16 → Oben/unten abschneiden
-        crop_width = orig_width
-        crop_height = int(orig_width / TARGET_RATIO)
+        crop_width = width
+        crop_height = int(width / TARGET_RATIO)
         crop_x = 0
 
         # Y-Position basierend auf Modus
         if crop_mode == "top":
             crop_y = 0
         elif crop_mode == "bottom":
-            crop_y = orig_height - crop_height
+            crop_y = height - crop_height
         else:  # center
-            crop_y = (orig_height - crop_height) // 2
+            crop_y = (height - crop_height) // 2
 
-    # Bild zuschneiden
-    cropped = img.crop((crop_x, crop_y, crop_x + crop_width, crop_y + crop_height))
+    return crop_x, crop_y, crop_width, crop_height
 
-    # Auf Zielgröße skalieren (hochwertige Lanczos-Interpolation)
-    result = cropped.resize((TARGET_WIDTH, TARGET_HEIGHT), Image.Resampling.LANCZOS)
 
-    # Als JPEG speichern
-    output = io.BytesIO()
-    result.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
-    jpeg_data = output.getvalue()
+def process_image_vips(image_data: bytes, crop_mode: str = "center",
+                       optimize: bool = False) -> tuple[bytes, dict]:
+    """
+    Wie process_image, aber mit pyvips: Dekodieren (mit Shrink-on-Load),
+    EXIF-Rotation, Zuschnitt, Skalierung und JPEG-Encoding laufen als eine
+    Pipeline über kleine Kacheln, ohne das volle Bild im Speicher zu halten.
+    Wie bei Pillow wird erst zugeschnitten und dann skaliert, damit extreme
+    Seitenverhältnisse nicht vorab riesig hochskaliert werden.
+    """
+    # pyvips erwartet bytes (Multipart-Uploads kommen als bytearray)
+    image_data = bytes(image_data)
+
+    # Nur den Header lesen für die Originalmaße (inkl. EXIF-Rotation);
+    # nur dieselben Formate wie bei Pillow zulassen
+    try:
+        img = pyvips.Image.new_from_buffer(image_data, '')
+    except pyvips.Error:
+        img = None
+    if img is None or img.get('vips-loader') not in VIPS_LOADERS:
+        raise UnidentifiedImageError("cannot identify image file")
+
+    rotated = bool(img.get_typeof('orientation')) and img.get('orientation') >= 5
+    orig_width, orig_height = img.width, img.height
+    if rotated:
+        orig_width, orig_height = orig_height, orig_width
+
+    # JPEGs direkt verkleinert laden (wie draft() bei Pillow), aber
+    # mindestens doppelte Zielgröße in Speicher-Ausrichtung behalten
+    if img.get('vips-loader') == 'jpegload_buffer':
+        min_width, min_height = TARGET_WIDTH * 2, TARGET_HEIGHT * 2
+        if rotated:
+            min_width, min_height = min_height, min_width
+        for shrink in (8, 4, 2):
+            if img.width // shrink >= min_width and img.height // shrink >= min_height:
+                img = pyvips.Image.new_from_buffer(image_data, '', shrink=shrink)
+                break
+
+    # EXIF-Rotation anwenden, dann zuschneiden und auf Zielgröße skalieren
+    img = img.autorot()
+    crop_x, crop_y, crop_width, crop_height = calculate_crop(img.width, img.height, crop_mode)
+    result = img.crop(crop_x, crop_y, crop_width, crop_height).thumbnail_image(
+        TARGET_WIDTH, height=TARGET_HEIGHT, size='force'
+    )
+
+    # In sRGB konvertieren, Transparenz auf weißen Hintergrund legen
+    if result.interpretation != 'srgb':
+        result = result.colourspace('srgb')
+    if result.hasalpha():
+        result = result.flatten(background=[255, 255, 255])
+
+    jpeg_data = result.jpegsave_buffer(
+        Q=JPEG_QUALITY, strip=True, optimize_coding=optimize,
+        interlace=False, subsample_mode='on'
+    )
 
     # Info zurückgeben
     info = {
@@ -135,61 +328,169 @@ def process_image(image_data: bytes, crop_mode: str = "center") -> tuple[bytes,
     return jpeg_data, info
 
 
+def process_image(image_data: bytes, crop_mode: str = "center",
+                  optimize: bool = False) -> tuple[bytes, dict]:
+    """
+    Verarbeitet ein Bild: Zuschnitt auf 9:16 und Skalierung auf 1080x1920.
+
+    Mit BACKEND 'vips' wird die Verarbeitung an process_image_vips
+    abgegeben.
+
+    Args:
+        image_data: Rohe Bilddaten als Bytes
+        crop_mode: Zuschnitt-Modus ('center', 'top', 'bottom')
+        optimize: Huffman-Tabellen optimieren (kleiner, aber langsamer)
+
+    Returns:
+        Tuple aus (verarbeitete JPEG-Bytes, Info-Dictionary)
+    """
+    if BACKEND == 'vips':
+        return process_image_vips(image_data, crop_mode, optimize)
+
+    # Bild öffnen
+    img = Image.open(io.BytesIO(image_data), formats=INPUT_FORMATS)
+
+    # EXIF-Ausrichtung vorab lesen (nur bei Formaten mit EXIF), Werte 5-8
+    # bedeuten um 90° gedreht gespeichert
+    orientation = 1
+    if img.format in EXIF_FORMATS:
+        orientation = img.getexif().get(ORIENTATION_TAG, 1)
+    rotated = orientation in (5, 6, 7, 8)
+
+    # Original-Dimensionen speichern (vor dem Draft, in Anzeige-Ausrichtung)
+    source_width, source_height = img.size
+    if rotated:
+        source_width, source_height = source_height, source_width
+
+    # JPEGs direkt verkleinert dekodieren (DCT-Skalierung 1/2, 1/4, 1/8),
+    # aber mindestens doppelte Zielgröße für eine saubere Skalierung behalten
+    # (bei gedreht gespeicherten Bildern Breite und Höhe tauschen)
+    draft_size = (TARGET_WIDTH * 2, TARGET_HEIGHT * 2)
+    if rotated:
+        draft_size = draft_size[::-1]
+    try:
+        img.draft('RGB', draft_size)
+    except (AttributeError, ValueError):
+        pass
+
+    # EXIF-Rotation korrigieren (nur wenn nötig, exif_transpose kopiert sonst)
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+
+    # Palettenbilder lassen sich nicht interpolieren → vor dem Skalieren
+    # konvertieren, alles andere erst nach dem Skalieren (kleinere Fläche)
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    elif img.mode not in RESIZE_MODES:
+        img = img.convert('RGB')
+
+    # Zuschnitt-Bereich aus den dekodierten Dimensionen (nach Draft und Rotation)
+    crop_x, crop_y, crop_width, crop_height = calculate_crop(*img.size, crop_mode)
+
+    # Filter wählen (bei starker Verkleinerung reicht HAMMING)
+    resample = RESAMPLE
+    if not RESAMPLE_ENV and crop_width > TARGET_WIDTH * 3:
+        resample = Image.Resampling.HAMMING
+
+    # Zuschneiden und auf Zielgröße skalieren in einem Schritt
+    # (box spart das Zwischenbild)
+    crop_box = (crop_x, crop_y, crop_x + crop_width, crop_y + crop_height)
+    result = img.resize((TARGET_WIDTH, TARGET_HEIGHT), resample, box=crop_box)
+
+    # In RGB konvertieren (falls RGBA oder anderes Format)
+    if result.mode in ('RGBA', 'LA'):
+        # Weißer Hintergrund für transparente Bilder
+        background = Image.new('RGB', result.size, (255, 255, 255))
+        background.paste(result, mask=result.getchannel('A'))
+        result = background
+    elif result.mode != 'RGB':
+        result = result.convert('RGB')
+
+    # Als JPEG speichern (optimize erzwingt einen zweiten Huffman-Durchlauf,
+    # baseline statt progressive und 4:2:0-Chroma-Subsampling halten den
+    # Encoder schnell).
+    # Vorab reservierter Puffer vermeidet wiederholtes Vergrößern; nach dem
+    # Kürzen gibt getvalue() den Puffer ohne weitere Kopie zurück.
+    output = io.BytesIO(bytes(JPEG_BUFFER_SIZE))
+    result.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=optimize,
+                progressive=False, subsampling=2)
+    output.truncate()
+    jpeg_data = output.getvalue()
+
+    # Info zurückgeben
+    info = {
+        "original_width": source_width,
+        "original_height": source_height,
+        "crop_mode": crop_mode,
+        "result_width": TARGET_WIDTH,
+        "result_height": TARGET_HEIGHT,
+        "file_size": len(jpeg_data)
+    }
+
+    return jpeg_data, info
+
+
 class SnapchatFormatterHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP-Handler für den Snapchat-Formatierer."""
 
+    # Header nicht per Nagle-Algorithmus zurückhalten (TCP_NODELAY je Verbindung)
+    disable_nagle_algorithm = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=str(DIRECTORY), **kwargs)
 
     def do_POST(self):
         """Verarbeitet POST-Requests für Bildverarbeitung."""
 
-        if self.path == "/api/process":
-            self._handle_process()
+        url = urlparse(self.path)
+
+        if url.path == "/api/process":
+            self._handle_process(parse_qs(url.query))
         else:
             self.send_error(404, "Endpoint nicht gefunden")
 
-    def _handle_process(self):
+    def _handle_process(self, query: dict):
         """Verarbeitet ein hochgeladenes Bild."""
 
         try:
+            # Größe prüfen, bevor irgendetwas gelesen wird
+            if 'Content-Length' not in self.headers:
+                self._send_json_error("Content-Length fehlt", 411)
+                return
+
+            try:
+                content_length = int(self.headers['Content-Length'])
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                self._send_json_error("Ungültige Content-Length", 400)
+                return
+
+            if content_length > MAX_UPLOAD_BYTES:
+                self._send_json_error(
+                    f"Datei zu groß (maximal {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)", 413
+                )
+                return
+
             # Content-Type prüfen
             content_type = self.headers.get('Content-Type', '')
 
             if 'multipart/form-data' in content_type:
-                # Multipart-Daten parsen
-                boundary = content_type.split('boundary=')[1].encode()
-                content_length = int(self.headers['Content-Length'])
-                body = self.rfile.read(content_length)
+                # Multipart-Daten direkt vom Socket parsen
+                boundary = content_type.split('boundary=')[1].split(';')[0].strip('"').encode()
+                fields = self._read_multipart(boundary, content_length)
 
-                # Einfaches Multipart-Parsing
-                parts = body.split(b'--' + boundary)
-                image_data = None
-                crop_mode = "center"
+                image_data = fields.get('image')
+                crop_mode = fields.get('mode', b'center').decode().strip()
 
-                for part in parts:
-                    if b'name="image"' in part:
-                        # Bilddaten extrahieren (nach doppeltem CRLF)
-                        data_start = part.find(b'\r\n\r\n') + 4
-                        data_end = part.rfind(b'\r\n')
-                        if data_start > 4 and data_end > data_start:
-                            image_data = part[data_start:data_end]
-
-                    elif b'name="mode"' in part:
-                        data_start = part.find(b'\r\n\r\n') + 4
-                        data_end = part.rfind(b'\r\n')
-                        if data_start > 4 and data_end > data_start:
-                            crop_mode = part[data_start:data_end].decode().strip()
-
-                if image_data is None:
+                if not image_data:
                     self._send_json_error("Kein Bild gefunden", 400)
                     return
 
             elif 'application/json' in content_type:
                 # JSON mit Base64-Bild
-                content_length = int(self.headers['Content-Length'])
                 body = self.rfile.read(content_length)
-                data = json.loads(body)
+                data = _loads(body)
 
                 # Base64-Daten extrahieren
                 image_b64 = data.get('image', '')
@@ -199,37 +500,145 @@ class SnapchatFormatterHandler(http.server.SimpleHTTPRequestHandler):
                 image_data = base64.b64decode(image_b64)
                 crop_mode = data.get('mode', 'center')
 
+            elif content_type.startswith(('image/', 'application/octet-stream')):
+                # Rohe Bilddaten, Modus im Header (schnellster Weg)
+                image_data = self.rfile.read(content_length)
+                crop_mode = self.headers.get('X-Crop-Mode', 'center')
+
+                if not image_data:
+                    self._send_json_error("Kein Bild gefunden", 400)
+                    return
+
             else:
                 self._send_json_error("Ungültiger Content-Type", 400)
                 return
 
-            # Bild verarbeiten
-            result_data, info = process_image(image_data, crop_mode)
+            # Zuschnitt-Modus normalisieren (unbekannte Werte → center),
+            # damit der Cache-Schlüssel hashbar und eindeutig ist
+            if crop_mode not in CROP_MODES:
+                crop_mode = "center"
+
+            # Optionale Huffman-Optimierung (?optimize=1)
+            optimize = query.get('optimize', ['0'])[0] in ('1', 'true')
+
+            # Bereits verarbeitet? Sonst im Worker-Prozess verarbeiten
+            cache_key = (_content_hash(image_data), crop_mode, optimize)
+            cached = cache_get(cache_key)
+            if cached is None:
+                result_data, info = run_in_executor(image_data, crop_mode, optimize)
+                cache_put(cache_key, (result_data, info))
+            else:
+                result_data, info = cached
+
+            # Altes Format: Ergebnis als Base64 in JSON (?format=json)
+            if query.get('format', [''])[0] == 'json':
+                result_b64 = base64.b64encode(result_data).decode()
 
-            # Ergebnis als Base64 zurückgeben
-            result_b64 = base64.b64encode(result_data).decode()
+                response = {
+                    "success": True,
+                    "image": f"data:image/jpeg;base64,{result_b64}",
+                    "info": info
+                }
 
-            response = {
-                "success": True,
-                "image": f"data:image/jpeg;base64,{result_b64}",
-                "info": info
-            }
+                self._send_json_response(response)
+                return
+
+            # Ergebnis direkt als JPEG senden, Info im Header
+            self._send_jpeg_response(result_data, info, cached is not None)
 
-            self._send_json_response(response)
+        except UnidentifiedImageError:
+            self._send_json_error("Nicht unterstütztes Bildformat (nur JPEG, PNG, WebP)", 400)
 
         except Exception as e:
             self._send_json_error(f"Fehler bei der Verarbeitung: {str(e)}", 500)
 
+    def _read_multipart(self, boundary: bytes, content_length: int) -> dict:
+        """
+        Liest multipart/form-data blockweise direkt aus dem Socket.
+
+        Der Body wird nie als Ganzes gepuffert; jedes Feld landet ohne
+        weitere Kopie in einem eigenen bytearray.
+        """
+        delimiter = b'\r\n--' + boundary
+        remaining = content_length
+        # Die erste Grenze steht ohne führendes CRLF am Anfang des Bodys
+        buffer = bytearray(b'\r\n')
+        search_start = 0
+        fields = {}
+        name = None
+
+        def read_chunk() -> bool:
+            nonlocal remaining
+            if remaining <= 0:
+                return False
+            chunk = self.rfile.read(min(remaining, READ_CHUNK_SIZE))
+            if not chunk:
+                return False
+            remaining -= len(chunk)
+            buffer.extend(chunk)
+            return True
+
+        while True:
+            pos = buffer.find(delimiter, search_start)
+            if pos == -1:
+                # Nur den neuen Block (plus Überlappung) erneut durchsuchen
+                search_start = max(0, len(buffer) - len(delimiter) + 1)
+                if not read_chunk():
+                    break
+                continue
+
+            # Feldinhalt abtrennen: Rest kopieren, Inhalt nur kürzen
+            value = buffer
+            with memoryview(value) as view:
+                buffer = bytearray(view[pos + len(delimiter):])
+            del value[pos:]
+            if name is not None:
+                fields[name] = value
+
+            # Header des nächsten Teils lesen ('--' markiert das Ende)
+            while (b'\r\n\r\n' not in buffer and not buffer.startswith(b'--')
+                   and read_chunk()):
+                pass
+            header_end = buffer.find(b'\r\n\r\n')
+            if buffer.startswith(b'--') or header_end == -1:
+                break
+
+            with memoryview(buffer) as view:
+                headers = bytes(view[:header_end])
+            del buffer[:header_end + 4]
+            search_start = 0
+
+            name_start = headers.find(b'; name="')
+            if name_start == -1:
+                name = None
+            else:
+                name_start += len(b'; name="')
+                name = headers[name_start:headers.find(b'"', name_start)].decode()
+
+        return fields
+
     def _send_json_response(self, data: dict, status: int = 200):
         """Sendet eine JSON-Antwort."""
-        response = json.dumps(data).encode()
+        response = _dumps(data)
 
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Content-Length', len(response))
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(response)
+        self.wfile.write(memoryview(response))
+
+    def _send_jpeg_response(self, jpeg_data: bytes, info: dict, cache_hit: bool = False):
+        """Sendet das verarbeitete Bild als JPEG mit Info im X-Image-Info Header."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', len(jpeg_data))
+        self.send_header('X-Image-Info', json.dumps(info))
+        self.send_header('X-Cache', 'HIT' if cache_hit else 'MISS')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'X-Image-Info, X-Cache')
+        self.end_headers()
+        self.wfile.write(memoryview(jpeg_data))
 
     def _send_json_error(self, message: str, status: int):
         """Sendet eine JSON-Fehlermeldung."""
@@ -240,7 +649,7 @@ class SnapchatFormatterHandler(http.server.SimpleHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Crop-Mode')
         self.end_headers()
 
     def end_headers(self):
@@ -253,6 +662,19 @@ class SnapchatFormatterHandler(http.server.SimpleHTTPRequestHandler):
         print(f"[{self.log_date_time_string()}] {args[0]}")
 
 
+class SnapchatFormatterServer(http.server.ThreadingHTTPServer):
+    """Threading-HTTP-Server mit größerer Warteschlange und Sendepuffer."""
+
+    request_queue_size = 128
+    allow_reuse_address = True
+
+    def server_bind(self):
+        """Setzt Socket-Optionen, die akzeptierte Verbindungen erben."""
+        super().server_bind()
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+
+
 def main():
     """Startet den Server."""
 
@@ -262,13 +684,17 @@ def main():
         print(f"Fehler: {index_path} nicht gefunden!")
         return
 
+    # Worker-Prozesse starten
+    global EXECUTOR
+    EXECUTOR = start_executor()
+
     # Server starten
-    with socketserver.TCPServer((HOST, PORT), SnapchatFormatterHandler) as httpd:
+    with SnapchatFormatterServer((HOST, PORT), SnapchatFormatterHandler) as httpd:
         url = f"http://{HOST}:{PORT}"
 
         print("=" * 50)
         print("  Snapchat Bild-Formatierer")
-        print("  (Serverseitige Bildverarbeitung mit Pillow)")
+        print(f"  (Serverseitige Bildverarbeitung mit {'pyvips' if BACKEND == 'vips' else 'Pillow'})")
         print("=" * 50)
         print(f"\n  Server läuft auf: {url}")
         print("  Drücke Strg+C zum Beenden\n")
@@ -286,6 +712,8 @@ def main():
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n\nServer beendet.")
+        finally:
+            EXECUTOR.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":